@@ -7,10 +7,12 @@ import asyncio
 import logging
 import os
 import json
-from datetime import datetime
+import time
+from dataclasses import dataclass
 from typing import Final, Optional
 
 from telegram import Update
+from telegram.error import TelegramError
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -26,7 +28,19 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TARGET_URL = os.getenv("TARGET_URL", "https://iso-toolkit.onrender.com/")
 API_URL = os.getenv("API_URL", "https://iso-toolkit.onrender.com/api")
 API_KEY = os.getenv("API_KEY", "")  # API key for authentication
+OWNER_CHAT_ID_STR = os.getenv("OWNER_CHAT_ID", "")  # Optional: receives failure alerts
 PING_INTERVAL = 600  # 10 minutes in seconds
+# Fail fast on a dead connection instead of always waiting the full 30s
+_PING_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=10, sock_read=20)
+ALERT_DEBOUNCE = 1800  # At most one failure alert per 30 minutes
+WAKE_RETRY_DELAYS = (0, 2, 4, 8)  # Backoff between /wake attempts, in seconds
+WAKE_DEADLINE = 20  # Cap on all /wake attempts for one URL, pings included
+WAKING_STATUS_CODES = (502, 503)  # Render answers with these while spinning up
+PING_CACHE_TTL = 60  # /check and /status reuse ping results younger than this
+SITE_IDLE_TIMEOUT = 900  # Render's free plan spins a site down after 15 idle minutes
+# Auto-ping skips URLs a /check reached this recently; any longer and a skipped
+# tick plus the next interval could outlast SITE_IDLE_TIMEOUT
+PING_FRESH_FOR = SITE_IDLE_TIMEOUT - PING_INTERVAL
 
 # URLs to keep alive
 PING_TARGETS = [
@@ -42,6 +56,16 @@ if not TELEGRAM_BOT_TOKEN:
         "export TELEGRAM_BOT_TOKEN=your_token_here"
     )
 
+if not TARGET_URL.startswith(("http://", "https://")):
+    raise ValueError(f"TARGET_URL must start with http:// or https://, got: {TARGET_URL!r}")
+
+try:
+    OWNER_CHAT_ID: Optional[int] = int(OWNER_CHAT_ID_STR) if OWNER_CHAT_ID_STR else None
+except ValueError:
+    raise ValueError(
+        f"OWNER_CHAT_ID must be a numeric Telegram chat ID, got: {OWNER_CHAT_ID_STR!r}"
+    ) from None
+
 # Enable logging
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -49,43 +73,107 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+def _parse_admin_ids(raw: str) -> frozenset[int]:
+    """Parse comma-separated ADMIN_CHAT_IDS, rejecting any entry that isn't an integer."""
+    ids = set()
+    for token in raw.split(","):
+        token = token.strip()
+        if not token:
+            continue
+        try:
+            ids.add(int(token))
+        except ValueError:
+            raise ValueError(
+                f"ADMIN_CHAT_IDS must be comma-separated numeric chat IDs, got: {token!r}"
+            ) from None
+    return frozenset(ids)
+
+
 # Admin user IDs (comma-separated in env)
-ADMIN_IDS = set()
-if admin_ids_str := os.getenv("ADMIN_CHAT_IDS", ""):
-    ADMIN_IDS = set(int(x.strip()) for x in admin_ids_str.split(",") if x.strip())
+ADMIN_IDS: frozenset[int] = _parse_admin_ids(os.getenv("ADMIN_CHAT_IDS", ""))
+
+
+@dataclass(slots=True)
+class PingStats:
+    """Running auto-ping counters."""
+    total: int = 0
+    success: int = 0
+    failed: int = 0
+
 
+@dataclass(slots=True, frozen=True)
+class PingResult:
+    """Outcome of one ping: ok flag, HTTP status (0 when unreachable), message."""
+    ok: bool
+    status: int
+    message: str
 
-async def ping_site(url: str) -> tuple[bool, str, int]:
+
+# Shared results for the statuses a healthy site answers with
+_OK_CACHE: Final[dict[int, PingResult]] = {
+    s: PingResult(True, s, "Site is online") for s in (200, 204, 301, 302)
+}
+
+
+def _now_hms() -> str:
+    """Current local time as HH:MM:SS."""
+    return time.strftime('%H:%M:%S')
+
+
+def _now_full() -> str:
+    """Current local date and time as YYYY-MM-DD HH:MM:SS."""
+    return time.strftime('%Y-%m-%d %H:%M:%S')
+
+
+async def ping_site(
+    session: aiohttp.ClientSession,
+    url: str,
+    method: str = "GET"
+) -> PingResult:
     """
     Ping the target site and return status.
-    Returns: (success, message, status_code)
+    Use method="HEAD" when only the status matters, to skip the page body;
+    targets that reject HEAD with 405 are retried once with GET.
     """
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                url,
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as response:
-                return (
-                    True,
-                    "Site is online",
-                    response.status
-                )
-    except asyncio.TimeoutError:
-        return False, "Request timed out", 0
+        async with session.request(method, url) as response:
+            # HEAD replies carry no body. A GET body has to be drained, or
+            # aiohttp closes the socket instead of returning it to the pool.
+            if method != "HEAD":
+                await response.read()
+            status = response.status
+        if status == 405 and method == "HEAD":
+            return await ping_site(session, url)
+        return _OK_CACHE.get(status) or PingResult(True, status, "Site is online")
+    except asyncio.CancelledError:
+        raise
+    except (asyncio.TimeoutError, aiohttp.ServerTimeoutError):
+        return PingResult(False, 0, "Request timed out")
     except aiohttp.ClientError as e:
-        return False, f"Connection error: {e}", 0
-    except Exception as e:
-        return False, f"Unexpected error: {e}", 0
+        return PingResult(False, 0, f"Connection error: {e}")
 
 
-async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Send a message when the command /start is issued."""
-    user = update.effective_user
-    is_admin = update.effective_user.id in ADMIN_IDS if ADMIN_IDS else False
+async def cached_ping(context: ContextTypes.DEFAULT_TYPE, url: str) -> PingResult:
+    """
+    Return the last ping result for url if it succeeded less than
+    PING_CACHE_TTL ago, otherwise ping now and remember the result.
+    Failures are never reused, so a site that just came back shows as up.
+    """
+    last_ping = context.bot_data["last_ping"]
+    cached = last_ping.get(url)
+    if cached and cached[1].ok and time.monotonic() - cached[0] < PING_CACHE_TTL:
+        return cached[1]
+
+    result = await ping_site(context.bot_data["http_session"], url)
+    last_ping[url] = (time.monotonic(), result)
+    return result
 
-    welcome_message = f"""
-👋 Hi {user.first_name}!
+
+def _build_start_template(is_admin: bool) -> str:
+    """Build the /start message with a single {name} slot."""
+    return f"""
+👋 Hi {{name}}!
 
 I'm your ISO Toolkit bot.
 
@@ -103,12 +191,13 @@ I'm your ISO Toolkit bot.
 
 ⏰ I'll automatically ping {len(PING_TARGETS)} sites every 10 minutes to keep them alive.
     """
-    await update.message.reply_text(welcome_message)
 
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Show help message."""
-    help_text = f"""
+# Static replies, built once at import instead of per command
+_START_TEMPLATE = _build_start_template(is_admin=False)
+_START_TEMPLATE_ADMIN = _build_start_template(is_admin=True)
+
+_HELP_TEXT = f"""
 🤖 Available Commands:
 
 /check - Check if sites are online
@@ -119,7 +208,42 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 
 The bot automatically pings {len(PING_TARGETS)} sites every 10 minutes to prevent Render from spinning them down.
     """
-    await update.message.reply_text(help_text)
+
+_STATUS_HEADER = f"""
+🤖 Bot Status:
+━━━━━━━━━━━━━━━━
+Targets ({len(PING_TARGETS)}):
+"""
+
+_STATUS_FOOTER_TEMPLATE = """
+Auto-ping: Every 10 minutes
+━━━━━━━━━━━━━━━━
+Last Check: {checked_at}
+    """
+
+_STATS_TEMPLATE = """
+📊 Ping Statistics:
+━━━━━━━━━━━━━━━━
+Total Pings: {total}
+Successful: {success} ✅
+Failed: {failed} ❌
+Success Rate: {success_rate:.1f}%
+Uptime: {uptime}
+    """
+
+
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send a message when the command /start is issued."""
+    user = update.effective_user
+    is_admin = user.id in ADMIN_IDS if ADMIN_IDS else False
+
+    template = _START_TEMPLATE_ADMIN if is_admin else _START_TEMPLATE
+    await update.message.reply_text(template.format(name=user.first_name))
+
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show help message."""
+    await update.message.reply_text(_HELP_TEXT)
 
 
 async def check_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -128,120 +252,172 @@ async def check_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
     results = []
     for url in PING_TARGETS:
-        success, message, status_code = await ping_site(url)
-        if success:
-            results.append(f"✅ {url}\nStatus: {message}\nHTTP Code: {status_code}")
+        result = await cached_ping(context, url)
+        if result.ok:
+            results.append(f"✅ {url}\nStatus: {result.message}\nHTTP Code: {result.status}")
         else:
-            results.append(f"❌ {url}\nError: {message}")
+            results.append(f"❌ {url}\nError: {result.message}")
 
     await msg.edit_text(
         "\n\n".join(results) + 
-        f"\n\nChecked at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        f"\n\nChecked at: {_now_full()}"
     )
 
 
 async def wake_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Wake up the sites by pinging them."""
+    session = context.bot_data["http_session"]
     msg = await update.message.reply_text("⏰ Waking up sites...")
 
     results = []
     for url in PING_TARGETS:
-        success1, message1, code1 = await ping_site(url)
-        if success1:
-            results.append(f"✅ {url} is awake (HTTP {code1})")
+        # Retry with backoff until the site answers with a non-spin-up status,
+        # giving up at WAKE_DEADLINE and reporting the last answer seen
+        attempt = 0
+        result = PingResult(False, 0, "Request timed out")
+        try:
+            async with asyncio.timeout(WAKE_DEADLINE):
+                for attempt, delay in enumerate(WAKE_RETRY_DELAYS):
+                    if delay:
+                        await asyncio.sleep(delay)
+                    result = await ping_site(session, url)
+                    if result.ok and result.status not in WAKING_STATUS_CODES:
+                        break
+        except TimeoutError:
+            pass
+
+        if result.ok and result.status not in WAKING_STATUS_CODES:
+            state = "is awake" if attempt == 0 else "is now awake"
+            results.append(f"✅ {url} {state} (HTTP {result.status})")
+        elif result.ok:
+            results.append(f"⏳ {url} is still waking up (HTTP {result.status})")
         else:
-            # Wait a bit and try again
-            await asyncio.sleep(2)
-            success2, message2, code2 = await ping_site(url)
-            if success2:
-                results.append(f"✅ {url} is now awake (HTTP {code2})")
-            else:
-                results.append(f"❌ Failed to wake {url}: {message2}")
+            results.append(f"❌ Failed to wake {url}: {result.message}")
 
     await msg.edit_text(
         "Wake result:\n\n" + 
         "\n".join(results) + 
-        f"\n\nTime: {datetime.now().strftime('%H:%M:%S')}"
+        f"\n\nTime: {_now_hms()}"
     )
 
 
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show bot status."""
-    status_text = f"""
-🤖 Bot Status:
-━━━━━━━━━━━━━━━━
-Targets ({len(PING_TARGETS)}):
-"""
+    status_text = _STATUS_HEADER
     for url in PING_TARGETS:
-        success, _, _ = await ping_site(url)
-        status_text += f"{'🟢' if success else '🔴'} {url}\n"
+        result = await cached_ping(context, url)
+        status_text += f"{'🟢' if result.ok else '🔴'} {url}\n"
 
-    status_text += f"""
-Auto-ping: Every 10 minutes
-━━━━━━━━━━━━━━━━
-Last Check: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-    """
+    status_text += _STATUS_FOOTER_TEMPLATE.format(
+        checked_at=_now_full()
+    )
     await update.message.reply_text(status_text)
 
 
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show ping statistics."""
     # Get stats from context
-    stats = context.bot_data.get('stats', {'total': 0, 'success': 0, 'failed': 0})
+    stats = context.bot_data["stats"]
 
-    success_rate = (stats['success']/stats['total']*100) if stats['total'] > 0 else 0
-
-    stats_text = f"""
-📊 Ping Statistics:
-━━━━━━━━━━━━━━━━
-Total Pings: {stats['total']}
-Successful: {stats['success']} ✅
-Failed: {stats['failed']} ❌
-Success Rate: {success_rate:.1f}%
-Uptime: {'🟢 Good' if stats['failed'] < stats['total'] * 0.1 else '🟡 Check targets'}
-    """
-    await update.message.reply_text(stats_text)
+    await update.message.reply_text(_STATS_TEMPLATE.format(
+        total=stats.total,
+        success=stats.success,
+        failed=stats.failed,
+        success_rate=stats.success * 100.0 / max(1, stats.total),
+        uptime='🟢 Good' if stats.failed < stats.total * 0.1 else '🟡 Check targets',
+    ))
 
 
 async def auto_ping_job(context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Background job that pings the sites every 10 minutes.
     """
-    logger.info(f"Running auto-ping for {len(PING_TARGETS)} targets...")
+    logger.info("Running auto-ping for %s targets...", len(PING_TARGETS))
     
-    stats = context.bot_data.get('stats', {'total': 0, 'success': 0, 'failed': 0})
+    session = context.bot_data["http_session"]
+    stats = context.bot_data["stats"]
     
     for url in PING_TARGETS:
-        success, message, status_code = await ping_site(url)
-        stats['total'] += 1
-        if success:
-            stats['success'] += 1
-            logger.info(f"✅ Auto-ping successful for {url}: HTTP {status_code}")
+        # A successful user ping this recent already kept the site awake
+        last = context.bot_data["last_ping"].get(url)
+        if last is not None and last[1].ok and time.monotonic() - last[0] < PING_FRESH_FOR:
+            logger.info("Skipping auto-ping for %s: reached %.0fs ago", url, time.monotonic() - last[0])
+            continue
+
+        result = await ping_site(session, url, method="HEAD")
+        context.bot_data["last_ping"][url] = (time.monotonic(), result)
+        stats.total += 1
+        if result.ok:
+            stats.success += 1
+            context.bot_data["consecutive_failures"][url] = 0
+            # The outage (if any) is over; the next one gets its own alert
+            context.bot_data["last_alert_ts"][url] = -float(ALERT_DEBOUNCE)
+            logger.info("✅ Auto-ping successful for %s: HTTP %s", url, result.status)
         else:
-            stats['failed'] += 1
-            logger.warning(f"❌ Auto-ping failed for {url}: {message}")
-
-            # Send notification to owner if failed
-            try:
-                owner_chat_id = os.getenv('OWNER_CHAT_ID')
-                if owner_chat_id:
+            stats.failed += 1
+            context.bot_data["consecutive_failures"][url] += 1
+            logger.warning("❌ Auto-ping failed for %s: %s", url, result.message)
+
+            # Notify the owner once per debounce window, not on every failed tick
+            now = time.monotonic()
+            if OWNER_CHAT_ID is not None and now - context.bot_data["last_alert_ts"][url] > ALERT_DEBOUNCE:
+                context.bot_data["last_alert_ts"][url] = now
+                try:
                     await context.bot.send_message(
-                        chat_id=owner_chat_id,
-                        text=f"⚠️ Auto-ping failed for {url}!\n\nError: {message}\n\nSite may be down."
+                        chat_id=OWNER_CHAT_ID,
+                        text=(
+                            f"⚠️ Auto-ping failed for {url}!\n\nError: {result.message}\n\n"
+                            f"Consecutive failures: {context.bot_data['consecutive_failures'][url]}\n"
+                            f"Site may be down."
+                        )
                     )
-            except Exception as e:
-                logger.error(f"Failed to send alert for {url}: {e}")
+                except TelegramError as e:
+                    logger.error("Failed to send alert for %s: %s", url, e)
+
+
+async def _post_init(application: Application) -> None:
+    """Create the HTTP session shared by all pings for the application's lifetime."""
+    # Keep idle connections around longer than PING_INTERVAL so the next
+    # auto-ping reuses the warm socket instead of doing a fresh TLS handshake
+    connector = aiohttp.TCPConnector(
+        limit=4,
+        limit_per_host=4,
+        keepalive_timeout=max(PING_INTERVAL + 60, 700),
+        ttl_dns_cache=600,
+        enable_cleanup_closed=True,
+        force_close=False,
+    )
+    application.bot_data["http_session"] = aiohttp.ClientSession(
+        connector=connector,
+        timeout=_PING_TIMEOUT,
+        headers={"Connection": "keep-alive", "User-Agent": "iso-toolkit-keepalive/1.0"},
+    )
 
-    context.bot_data['stats'] = stats
+
+async def _post_shutdown(application: Application) -> None:
+    """Close the shared HTTP session."""
+    session = application.bot_data.pop("http_session", None)
+    if session is not None:
+        await session.close()
 
 
 def main() -> None:
     """Start the bot."""
     # Create the Application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .post_init(_post_init)
+        .post_shutdown(_post_shutdown)
+        .build()
+    )
 
     # Initialize stats
-    application.bot_data['stats'] = {'total': 0, 'success': 0, 'failed': 0}
+    application.bot_data['stats'] = PingStats()
+    application.bot_data['last_ping'] = {}  # {url: (monotonic_ts, ping result)}
+    # Failure streaks and alert debounce are tracked per target
+    application.bot_data['consecutive_failures'] = {url: 0 for url in PING_TARGETS}
+    application.bot_data['last_alert_ts'] = {url: -float(ALERT_DEBOUNCE) for url in PING_TARGETS}
 
     # Register command handlers
     application.add_handler(CommandHandler("start", start_command))
@@ -256,12 +432,16 @@ def main() -> None:
         auto_ping_job,
         interval=PING_INTERVAL,
         first=10,
+        # Collapse missed runs (e.g. after a stalled event loop) into a single
+        # ping and never run two auto-pings at once
+        job_kwargs={"coalesce": True, "max_instances": 1, "misfire_grace_time": 60},
     )
 
     # Start the bot
     logger.info("Bot started. Auto-pinging every 10 minutes.")
-    logger.info(f"Target URL: {TARGET_URL}")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    logger.info("Target URL: %s", TARGET_URL)
+    # Only command messages are handled; skip commands queued while offline
+    application.run_polling(allowed_updates=[Update.MESSAGE], drop_pending_updates=True)
 
 
 if __name__ == "__main__":
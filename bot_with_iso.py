@@ -8,11 +8,20 @@ import json
 import logging
 import os
 import base64
+import bisect
+import errno
+import functools
+import mmap
+import shutil
 import tempfile
+import time
+import urllib.parse
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterable, AsyncIterator, Union
 
-from telegram import Update, Document
+from telegram import Update, Document, Message
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -20,6 +29,8 @@ from telegram.ext import (
     ContextTypes,
     filters,
 )
+from telegram.error import NetworkError, TelegramError, TimedOut
+from telegram.request import BaseRequest, RequestData
 
 import aiohttp
 
@@ -29,7 +40,32 @@ TARGET_URL = os.getenv("TARGET_URL", "https://iso-toolkit.onrender.com/")
 API_URL = os.getenv("API_URL", "https://iso-toolkit.onrender.com/api")
 API_KEY = os.getenv("API_KEY", "")
 PIXELDRAIN_API_KEY = os.getenv("PIXELDRAIN_API_KEY", "")
+# Auth headers never change at runtime, so they're built once here
+_PIXELDRAIN_AUTH_HEADER: Optional[Dict[str, str]] = {
+    "Authorization": f"Basic {base64.b64encode(f':{PIXELDRAIN_API_KEY}'.encode()).decode()}"
+} if PIXELDRAIN_API_KEY else None
+_API_AUTH_HEADER: Dict[str, str] = {"Authorization": f"Bearer {API_KEY}"}
+_API_BEARER: Dict[str, str] = {**_API_AUTH_HEADER, "Content-Type": "application/json"}
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB pieces streamed to PixelDrain
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # Up to 8MB pieces read from /fetch URLs
+UNITS = ("B", "KB", "MB", "GB", "TB", "PB")  # format_size units, 1024 apart
+_HAS_FADVISE = hasattr(os, "posix_fadvise")  # Linux page-cache hints
+SHM_DIR = "/dev/shm"  # tmpfs; temp files here never touch the disk
+USERS_PER_MESSAGE = 50  # /users page size, well under Telegram's 4096 chars
 PING_INTERVAL = 600  # 10 minutes
+PING_CACHE_TTL = 60  # /check reuses ping results younger than this
+SITE_IDLE_TIMEOUT = 900  # Render's free plan spins a site down after 15 idle minutes
+# Auto-ping skips URLs a /check reached this recently; any longer and a skipped
+# tick plus the next interval could outlast SITE_IDLE_TIMEOUT
+PING_FRESH_FOR = SITE_IDLE_TIMEOUT - PING_INTERVAL
+LIST_CACHE_TTL = 10.0  # /list reuses the hosted-ISO list for this long
+PROGRESS_EDIT_INTERVAL = 2.0  # Min seconds between upload/fetch status edits
+# Fail fast on a dead connection instead of always waiting the full 30s
+_PING_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=10, sock_read=20)
+# Transfers get per-phase limits only: a multi-hour ISO transfer is fine as
+# long as bytes keep flowing. API calls are small and get a hard cap.
+LONG_TIMEOUT = aiohttp.ClientTimeout(total=None, connect=30, sock_connect=30, sock_read=600)
+SHORT_TIMEOUT = aiohttp.ClientTimeout(total=30)
 
 # URLs to keep alive
 PING_TARGETS = [
@@ -37,6 +73,20 @@ PING_TARGETS = [
     "https://modringsbot.onrender.com/"
 ]
 
+# Validate required environment variables
+if not TELEGRAM_BOT_TOKEN:
+    raise ValueError(
+        "TELEGRAM_BOT_TOKEN environment variable is required! "
+        "Set it in your deployment platform or run: "
+        "export TELEGRAM_BOT_TOKEN=your_token_here"
+    )
+
+if not TARGET_URL.startswith(("http://", "https://")):
+    raise ValueError(f"TARGET_URL must start with http:// or https://, got: {TARGET_URL!r}")
+
+if not API_URL.startswith(("http://", "https://")):
+    raise ValueError(f"API_URL must start with http:// or https://, got: {API_URL!r}")
+
 # ============================================================================
 # ACCESS CONTROL
 # ============================================================================
@@ -44,13 +94,35 @@ PING_TARGETS = [
 # Owner ID - Only person who can use the bot initially
 OWNER_ID = 1851080851
 
+
+def _parse_admin_ids(raw: str) -> frozenset[int]:
+    """Parse comma-separated ADMIN_CHAT_IDS, rejecting any entry that isn't an integer."""
+    ids = set()
+    for token in raw.split(","):
+        token = token.strip()
+        if not token:
+            continue
+        try:
+            ids.add(int(token))
+        except ValueError:
+            raise ValueError(
+                f"ADMIN_CHAT_IDS must be comma-separated numeric chat IDs, got: {token!r}"
+            ) from None
+    return frozenset(ids)
+
+
 # Admin chat IDs (comma-separated) - DEPRECATED, use ALLOWED_USERS instead
-ADMIN_IDS = set()
-if admin_ids_str := os.getenv("ADMIN_CHAT_IDS", ""):
-    ADMIN_IDS = set(int(x.strip()) for x in admin_ids_str.split(",") if x.strip())
+ADMIN_IDS: frozenset[int] = _parse_admin_ids(os.getenv("ADMIN_CHAT_IDS", ""))
 
-# Current PixelDrain folder for uploads (stored per user in bot_data)
-CURRENT_FOLDER = {}  # {user_id: folder_name}
+# Shared HTTP sessions, one per kind of traffic (created lazily inside the
+# running event loop)
+_SESSIONS: Dict[str, aiohttp.ClientSession] = {}
+
+# Last hosted-ISO list from the server as (monotonic_ts, isos)
+_LIST_CACHE: Optional[tuple[float, list]] = None
+
+# Users authorized without an /allow entry: the owner plus any admins
+_BASE_AUTH: frozenset[int] = ADMIN_IDS | {OWNER_ID}
 
 # Logging
 logging.basicConfig(
@@ -59,44 +131,246 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# The keys are optional, but say up front which features are off without them
+if not API_KEY:
+    logger.warning("API_KEY not set - /list and server auto-match are disabled")
+if not PIXELDRAIN_API_KEY:
+    logger.warning("PIXELDRAIN_API_KEY not set - /fetch, folders and uploads over 7GB are disabled")
+
+
+# ============================================================================
+# HTTP SESSION
+# ============================================================================
+
+# Per-kind pool settings: (connection limit, idle keep-alive, default timeout).
+# Separate pools mean a long /fetch can't starve the auto-ping or API calls.
+_SESSION_SETTINGS: Dict[str, tuple[int, float, aiohttp.ClientTimeout]] = {
+    # Idle connections outlive PING_INTERVAL so auto-pings stay warm
+    "ping": (2, max(PING_INTERVAL + 60, 700), _PING_TIMEOUT),
+    "api": (10, 75, SHORT_TIMEOUT),
+    # PixelDrain uploads and /fetch downloads
+    "transfer": (8, 75, LONG_TIMEOUT),
+}
+
+
+async def get_session(kind: str = "api") -> aiohttp.ClientSession:
+    """
+    Return the process-wide HTTP session for kind, creating it on first use.
+
+    kind is "ping" (keep-alive pings), "api" (the ISO Toolkit server) or
+    "transfer" (PixelDrain uploads and /fetch downloads). Calls within a
+    kind share its connection pool, so repeated requests to the same host
+    reuse warm connections.
+    """
+    session = _SESSIONS.get(kind)
+    if session is None or session.closed:
+        limit, keepalive, timeout = _SESSION_SETTINGS[kind]
+        connector = aiohttp.TCPConnector(
+            limit=limit,
+            limit_per_host=limit,
+            keepalive_timeout=keepalive,
+            ttl_dns_cache=600,
+            enable_cleanup_closed=True,
+            force_close=False,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"User-Agent": "iso-toolkit-keepalive/1.0"},
+            timeout=timeout,
+            # Bigger reads for multi-GB bodies
+            read_bufsize=1 << 20 if kind == "transfer" else 2 ** 16,
+        )
+        _SESSIONS[kind] = session
+    return session
+
+
+async def close_session(application: Application) -> None:
+    """Close the shared HTTP sessions on shutdown."""
+    sessions = list(_SESSIONS.values())
+    _SESSIONS.clear()
+    for session in sessions:
+        await session.close()
+
+
+class AiohttpRequest(BaseRequest):
+    """
+    Bot API transport over aiohttp instead of PTB's default httpx backend.
+
+    Each instance owns its own pooled session, opened in initialize() and
+    closed in shutdown(), so the getUpdates long poll and regular Bot API
+    calls never wait on each other or on ISO transfers.
+    """
+
+    def __init__(
+        self,
+        connection_pool_size: int = 8,
+        read_timeout: Optional[float] = 5.0,
+        connect_timeout: Optional[float] = 5.0,
+        pool_timeout: Optional[float] = 1.0
+    ):
+        self._pool_size = connection_pool_size
+        self._read_timeout = read_timeout
+        self._connect_timeout = connect_timeout
+        self._pool_timeout = pool_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return self._read_timeout
+
+    async def initialize(self) -> None:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self._pool_size,
+                    ttl_dns_cache=600,
+                    enable_cleanup_closed=True,
+                ),
+                headers={"User-Agent": self.USER_AGENT},
+            )
+
+    async def shutdown(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[RequestData] = None,
+        read_timeout: Any = BaseRequest.DEFAULT_NONE,
+        write_timeout: Any = BaseRequest.DEFAULT_NONE,
+        connect_timeout: Any = BaseRequest.DEFAULT_NONE,
+        pool_timeout: Any = BaseRequest.DEFAULT_NONE,
+    ) -> tuple[int, bytes]:
+        if self._session is None or self._session.closed:
+            raise RuntimeError("This AiohttpRequest is not initialized!")
+
+        if read_timeout is BaseRequest.DEFAULT_NONE:
+            read_timeout = self._read_timeout
+        if connect_timeout is BaseRequest.DEFAULT_NONE:
+            connect_timeout = self._connect_timeout
+        if pool_timeout is BaseRequest.DEFAULT_NONE:
+            pool_timeout = self._pool_timeout
+
+        # aiohttp has no write timeout; its "connect" phase includes waiting
+        # for a free pooled connection, so the pool wait is folded in there
+        timeout = aiohttp.ClientTimeout(
+            total=None,
+            connect=(
+                None if connect_timeout is None or pool_timeout is None
+                else connect_timeout + pool_timeout
+            ),
+            sock_connect=connect_timeout,
+            sock_read=read_timeout,
+        )
+
+        data: Any = None
+        if request_data is not None:
+            files = request_data.multipart_data
+            if files:
+                data = aiohttp.FormData()
+                for name, value in request_data.json_parameters.items():
+                    data.add_field(name, value)
+                for name, (filename, content, mimetype) in files.items():
+                    data.add_field(name, content, filename=filename, content_type=mimetype)
+            else:
+                data = request_data.json_parameters
+
+        try:
+            async with self._session.request(method, url, data=data, timeout=timeout) as response:
+                return response.status, await response.read()
+        except asyncio.TimeoutError as e:
+            raise TimedOut from e
+        except aiohttp.ClientError as e:
+            raise NetworkError(f"aiohttp.{e.__class__.__name__}: {e}") from e
+
 
 # ============================================================================
 # KEEP-ALIVE FUNCTIONS (Original)
 # ============================================================================
 
-async def ping_site(url: str) -> tuple[bool, str, int]:
-    """Ping target site. Returns (success, message, status_code)."""
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                url,
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as response:
-                return True, "Site is online", response.status
-    except asyncio.TimeoutError:
-        return False, "Request timed out", 0
-    except Exception as e:
-        return False, str(e), 0
+@dataclass(slots=True)
+class PingStats:
+    """Running auto-ping counters."""
+    total: int = 0
+    success: int = 0
+    failed: int = 0
 
 
-async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Show welcome message."""
-    user = update.effective_user
-    user_id = user.id
+@dataclass(slots=True, frozen=True)
+class PingResult:
+    """Outcome of one ping: ok flag, HTTP status (0 when unreachable), message."""
+    ok: bool
+    status: int
+    message: str
 
-    # Check authorization
-    if not is_authorized(update, context):
-        # Silently ignore unauthorized users
-        return
 
-    is_owner = user_id == OWNER_ID
-    is_admin = user_id in ADMIN_IDS if ADMIN_IDS else False
+# Shared results for the statuses a healthy site answers with
+_OK_CACHE: Dict[int, PingResult] = {
+    s: PingResult(True, s, "Site is online") for s in (200, 204, 301, 302)
+}
+
+
+def _now_hms() -> str:
+    """Current local time as HH:MM:SS."""
+    return time.strftime('%H:%M:%S')
+
+
+def _now_full() -> str:
+    """Current local date and time as YYYY-MM-DD HH:MM:SS."""
+    return time.strftime('%Y-%m-%d %H:%M:%S')
+
+
+async def ping_site(url: str, method: str = "GET") -> PingResult:
+    """
+    Ping target site.
+    Use method="HEAD" when only the status matters, to skip the page body;
+    targets that reject HEAD with 405 are retried once with GET.
+    """
+    try:
+        session = await get_session("ping")
+        async with session.request(method, url, timeout=_PING_TIMEOUT) as response:
+            # HEAD replies carry no body. A GET body has to be drained, or
+            # aiohttp closes the socket instead of returning it to the pool.
+            if method != "HEAD":
+                await response.read()
+            status = response.status
+        if status == 405 and method == "HEAD":
+            return await ping_site(url)
+        return _OK_CACHE.get(status) or PingResult(True, status, "Site is online")
+    except asyncio.CancelledError:
+        raise
+    except (asyncio.TimeoutError, aiohttp.ServerTimeoutError):
+        return PingResult(False, 0, "Request timed out")
+    except aiohttp.ClientError as e:
+        return PingResult(False, 0, str(e))
+
+
+async def cached_ping(context: ContextTypes.DEFAULT_TYPE, url: str) -> PingResult:
+    """
+    Return the last ping result for url if it succeeded less than
+    PING_CACHE_TTL ago, otherwise ping now and remember the result.
+    Failures are never reused, so a site that just came back shows as up.
+    """
+    last_ping = context.bot_data["last_ping"]
+    cached = last_ping.get(url)
+    if cached and cached[1].ok and time.monotonic() - cached[0] < PING_CACHE_TTL:
+        return cached[1]
+
+    result = await ping_site(url)
+    last_ping[url] = (time.monotonic(), result)
+    return result
 
-    msg = f"""👋 Hi {user.first_name}!
+
+def _build_welcome_template(mode_line: str) -> str:
+    """Build the /start message for one access level, with a single {name} slot."""
+    return f"""👋 Hi {{name}}!
 
 I'm your ISO Toolkit bot.
 
-{'👑 **Owner Mode**' if is_owner else ('🔐 **Admin Mode**' if is_admin else '')}
+{mode_line}
 
 **Commands:**
 /check - Check site status
@@ -120,7 +394,38 @@ I'm your ISO Toolkit bot.
 
 ⏰ Auto-ping {len(PING_TARGETS)} sites every 10 min.
 """
-    await update.message.reply_text(msg)
+
+
+# Welcome variants, built once at import instead of per /start
+_WELCOME_OWNER = _build_welcome_template('👑 **Owner Mode**')
+_WELCOME_ADMIN = _build_welcome_template('🔐 **Admin Mode**')
+_WELCOME_USER = _build_welcome_template('')
+
+
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show welcome message."""
+    user = update.effective_user
+    user_id = user.id
+
+    # Check authorization
+    if not is_authorized(update, context):
+        # Silently ignore unauthorized users
+        return
+
+    if user_id == OWNER_ID:
+        template = _WELCOME_OWNER
+    elif user_id in ADMIN_IDS:
+        template = _WELCOME_ADMIN
+    else:
+        template = _WELCOME_USER
+    await update.message.reply_text(template.format(name=user.first_name))
+
+
+def _ping_report(url: str, result: PingResult) -> str:
+    """One /check or /wake result block."""
+    if result.ok:
+        return f"✅ {url}\nStatus: {result.message}\nHTTP: {result.status}"
+    return f"❌ {url}\nError: {result.message}"
 
 
 async def check_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -130,17 +435,30 @@ async def check_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
     msg = await update.message.reply_text("🔍 Checking sites...")
 
+    results = [_ping_report(url, await cached_ping(context, url)) for url in PING_TARGETS]
+
+    await msg.edit_text(
+        "\n\n".join(results) + 
+        f"\n\nTime: {_now_hms()}"
+    )
+
+
+async def wake_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Wake the sites up; unlike /check this always hits them, never the cache."""
+    if not is_authorized(update, context):
+        return  # Silently ignore
+
+    msg = await update.message.reply_text("⏰ Waking up sites...")
+
     results = []
     for url in PING_TARGETS:
-        success, message, status_code = await ping_site(url)
-        if success:
-            results.append(f"✅ {url}\nStatus: {message}\nHTTP: {status_code}")
-        else:
-            results.append(f"❌ {url}\nError: {message}")
+        result = await ping_site(url)
+        context.bot_data["last_ping"][url] = (time.monotonic(), result)
+        results.append(_ping_report(url, result))
 
     await msg.edit_text(
         "\n\n".join(results) + 
-        f"\n\nTime: {datetime.now().strftime('%H:%M:%S')}"
+        f"\n\nTime: {_now_hms()}"
     )
 
 
@@ -155,76 +473,343 @@ def is_admin(update: Update) -> bool:
     return update.effective_user.id in ADMIN_IDS
 
 
+@functools.lru_cache(maxsize=1024)
+def _is_auth(user_id: int, allowed_users: frozenset[int]) -> bool:
+    """Pure authorization check, memoized; cleared whenever allowed_users changes."""
+    return user_id in _BASE_AUTH or user_id in allowed_users
+
+
 def is_authorized(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     """
     Check if user is authorized to use the bot.
 
-    Owner (1851080851) and users explicitly allowed by owner can use the bot.
+    Owner (1851080851), admins from ADMIN_CHAT_IDS and users explicitly
+    allowed by owner can use the bot.
     Unauthorized users receive no response (silent ignore).
     """
     user_id = update.effective_user.id
 
-    # Owner always authorized
-    if user_id == OWNER_ID:
-        return True
-
-    # Check if user is in allowed list (stored in bot_data)
-    allowed_users = context.bot_data.get('allowed_users', set())
-    if user_id in allowed_users:
+    # Owner and admins always authorized, then the allowed list (stored in bot_data).
+    # Nothing goes into user_data here, so ignored strangers leave no state behind
+    if _is_auth(user_id, context.bot_data['allowed_users']):
         return True
 
     # Unauthorized - log and return False
-    logger.info(f"Unauthorized access attempt by user_id: {user_id}, username: {update.effective_user.username}")
+    logger.info(
+        "Unauthorized access attempt by user_id: %s, username: %s",
+        user_id, update.effective_user.username
+    )
     return False
 
 
-def format_size(bytes: int) -> str:
+async def init_bot_data(application: Application) -> None:
+    """
+    Normalize bot_data and open the HTTP session before polling starts.
+
+    allowed_users must be a frozenset: it is hashed by _is_auth's cache and
+    membership-tested on every command, so anything rehydrated as a list
+    (e.g. from JSON or a persistence backend) is converted once here.
+    The key is always present afterwards, so readers index it directly.
+    """
+    application.bot_data['allowed_users'] = frozenset(
+        application.bot_data.get('allowed_users', ())
+    )
+    # Sorted copy for /users, kept in step by /allow and /deny via bisect
+    application.bot_data['allowed_users_sorted'] = sorted(
+        application.bot_data['allowed_users']
+    )
+    # Open the shared HTTP sessions now rather than inside the first command
+    for kind in _SESSION_SETTINGS:
+        await get_session(kind)
+
+
+def format_size(n: int) -> str:
     """Format bytes to human readable."""
-    for unit in ["B", "KB", "MB", "GB", "TB"]:
-        if bytes < 1024:
-            return f"{bytes:.1f} {unit}"
-        bytes /= 1024
-    return f"{bytes:.1f} PB"
+    n = int(n)
+    # Each unit is 10 more bits, so the bit length picks the unit directly
+    idx = min(len(UNITS) - 1, max(0, (n.bit_length() - 1) // 10))
+    return f"{n / (1 << (10 * idx)):.1f} {UNITS[idx]}"
+
+
+def _tag_upload_folder(context: ContextTypes.DEFAULT_TYPE) -> str:
+    """
+    Count a finished upload against the user's current folder.
+
+    Returns a message line naming the folder, or "" if no folder is set.
+    """
+    folder_name = context.user_data.get("current_folder")
+    folder = context.user_data.get("folders", {}).get(folder_name)
+    if folder is None:
+        return ""
+    folder["file_count"] += 1
+    return f"📂 Folder: {folder_name}\n"
+
+
+class ThrottledMessage:
+    """
+    Status message whose edits reach Telegram at most once per min_interval.
+
+    An edit that arrives too soon is held back and sent when the interval
+    runs out; a newer edit replaces a held-back one, so quick status
+    transitions collapse into a single API call. flush() sends whatever is
+    still held back and must run before the command returns.
+    """
+
+    def __init__(self, message: Message, min_interval: float = PROGRESS_EDIT_INTERVAL):
+        self._msg = message
+        self.min_interval = min_interval
+        self.last_edit = time.monotonic()  # The reply itself just went out
+        self._pending: Optional[str] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()  # Keeps edits in order
+
+    async def edit_text(self, text: str) -> None:
+        wait = self.last_edit + self.min_interval - time.monotonic()
+        if wait <= 0 and self._timer is None:
+            await self._send(text)
+            return
+        self._pending = text
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later(wait))
+
+    async def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self._send_pending()
+
+    async def _flush_later(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._timer = None
+        await self._send_pending()
+
+    async def _send_pending(self) -> None:
+        text, self._pending = self._pending, None
+        if text is not None:
+            await self._send(text)
+
+    async def _send(self, text: str) -> None:
+        async with self._lock:
+            try:
+                await self._msg.edit_text(text)
+            except TelegramError as e:
+                # A lost progress edit must not abort the upload itself
+                logger.warning("Status edit failed: %s", e)
+            self.last_edit = time.monotonic()
+
+
+def _best_tmpdir(size: Optional[int]) -> Optional[str]:
+    """
+    Pick where a temp file of size bytes should live.
+
+    Returns SHM_DIR when the file comfortably fits in the tmpfs (under 70%
+    of its free space), else None for tempfile's default directory.
+    """
+    if not size or not os.path.isdir(SHM_DIR):
+        return None
+    try:
+        free = shutil.disk_usage(SHM_DIR).free
+    except OSError:
+        return None
+    return SHM_DIR if size < free * 0.7 else None
+
+
+async def download_document(document: Document) -> str:
+    """
+    Download a Telegram document to a temp file and return its path.
+
+    The file goes to tmpfs when it fits (see _best_tmpdir); if tmpfs fills
+    up mid-download the partial file is dropped and the download retried
+    on disk. The caller owns the returned file and must unlink it.
+    """
+    file = await document.get_file()
+    tmpdir = _best_tmpdir(document.file_size)
+    while True:
+        # File creation and removal are blocking syscalls (unlinking a
+        # multi-GB file can take a while), so they run off the event loop
+        fd, temp_path = await asyncio.to_thread(tempfile.mkstemp, suffix=".iso", dir=tmpdir)
+        os.close(fd)
+        try:
+            await file.download_to_drive(temp_path)
+            return temp_path
+        except BaseException as e:
+            await asyncio.to_thread(os.unlink, temp_path)
+            if not isinstance(e, OSError) or e.errno != errno.ENOSPC or tmpdir is None:
+                raise
+            # tmpfs filled up meanwhile; retry on disk
+            tmpdir = None
+
+
+class UploadStatus:
+    """
+    Status text for one transfer.
+
+    The file name and size lines are formatted once (and again only when
+    set_size() learns a new size); render() just puts a state title above
+    them and any state-specific lines below.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        size: Optional[int],
+        name_label: str = "📄 ",
+        size_label: str = "📏 "
+    ):
+        self._name_line = f"{name_label}{filename}\n"
+        self._size_label = size_label
+        self.set_size(size)
+
+    def set_size(self, size: Optional[int]) -> None:
+        size_text = format_size(size) if size else "Unknown size"
+        self.header = f"{self._name_line}{self._size_label}{size_text}\n"
+
+    def render(self, title: str, body: str = "") -> str:
+        return f"{title}\n\n{self.header}{body}"
+
+
+async def iter_file_chunks(file_path: str) -> AsyncIterator[bytes]:
+    """
+    Yield a file in UPLOAD_CHUNK_SIZE pieces for streaming uploads.
+
+    The file is memory-mapped and yielded as memoryview slices, so the socket
+    writes read straight from the page cache with no intermediate copy.
+    Files that can't be mapped (e.g. empty ones) are read normally. The
+    kernel is told the read is sequential and, once done, that the cached
+    pages can go.
+    """
+    with open(file_path, "rb") as f:
+        if _HAS_FADVISE:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        try:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                while chunk := await asyncio.to_thread(f.read, UPLOAD_CHUNK_SIZE):
+                    yield chunk
+                return
+
+            can_advise = hasattr(mm, "madvise")
+            if can_advise:
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            view = memoryview(mm)
+            try:
+                for offset in range(0, len(mm), UPLOAD_CHUNK_SIZE):
+                    if can_advise and offset + UPLOAD_CHUNK_SIZE < len(mm):
+                        # Start reading the next slice from disk while this one is sent
+                        next_offset = offset + UPLOAD_CHUNK_SIZE
+                        mm.madvise(
+                            mmap.MADV_WILLNEED,
+                            next_offset,
+                            min(UPLOAD_CHUNK_SIZE, len(mm) - next_offset)
+                        )
+                    yield view[offset:offset + UPLOAD_CHUNK_SIZE]
+            finally:
+                view.release()
+                try:
+                    mm.close()
+                except BufferError:
+                    # A slice is still queued in the transport; the map is
+                    # unmapped once that last reference is dropped
+                    pass
+        finally:
+            if _HAS_FADVISE:
+                # The upload is the last reader; drop the pages so a
+                # multi-GB temp file doesn't crowd out the page cache
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+class _SizedStreamPayload(aiohttp.payload.AsyncIterablePayload):
+    """Streamed payload with a known length, so uploads carry a Content-Length."""
+
+    def __init__(self, value: AsyncIterable[bytes], size: int, **kwargs: Any) -> None:
+        super().__init__(value, **kwargs)
+        self._size = size
+
+
+async def _pump_download(response: aiohttp.ClientResponse, queue: asyncio.Queue) -> None:
+    """Feed a download's body into queue, ending with None (or the error raised)."""
+    try:
+        async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+            await queue.put(chunk)
+    except Exception as e:
+        await queue.put(e)
+    else:
+        await queue.put(None)
+
+
+async def _iter_queue(queue: asyncio.Queue) -> AsyncIterator[bytes]:
+    """Yield chunks put by _pump_download() until it signals the end."""
+    while (item := await queue.get()) is not None:
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+async def pipe_to_pixeldrain(
+    response: aiohttp.ClientResponse,
+    filename: str,
+    size: int
+) -> Dict[str, Any]:
+    """
+    Upload a download's body to PixelDrain while it is still arriving.
+
+    A small bounded queue sits between the two so the download keeps
+    reading while the upload is writing, without touching disk.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=8)
+    pump = asyncio.create_task(_pump_download(response, queue))
+    try:
+        return await upload_to_pixeldrain(_iter_queue(queue), filename, size=size)
+    finally:
+        pump.cancel()
 
 
 async def upload_to_pixeldrain(
-    file_path: str,
-    filename: str
+    source: Union[str, AsyncIterable[bytes]],
+    filename: str,
+    size: Optional[int] = None
 ) -> Dict[str, Any]:
-    """Upload file to PixelDrain."""
+    """
+    Upload file to PixelDrain as a streamed PUT body.
+
+    source is a path on disk or an async iterable of byte chunks; size is
+    required for iterables and must match the bytes they yield.
+    """
     if not PIXELDRAIN_API_KEY:
         return {"success": False, "error": "No API key"}
 
-    credentials = base64.b64encode(f":{PIXELDRAIN_API_KEY}".encode()).decode()
-    headers = {"Authorization": f"Basic {credentials}"}
+    if isinstance(source, str):
+        size = os.path.getsize(source)
+        chunks = iter_file_chunks(source)
+    else:
+        chunks = source
 
     try:
-        async with aiohttp.ClientSession() as session:
-            with open(file_path, "rb") as f:
-                data = aiohttp.FormData()
-                data.add_field("file", f, filename=filename)
-
-                async with session.post(
-                    "https://pixeldrain.com/api/file",
-                    data=data,
-                    headers=headers,
-                    timeout=aiohttp.ClientTimeout(total=3600)
-                ) as response:
-                    if response.status in [200, 201]:  # Accept both 200 and 201
-                        # PixelDrain returns text/plain, parse as JSON manually
-                        response_text = await response.text()
-                        result = json.loads(response_text)
-                        file_id = result.get("id")
-                        return {
-                            "success": True,
-                            "file_id": file_id,
-                            "download_url": f"https://pixeldrain.com/api/file/{file_id}",
-                            "view_url": f"https://pixeldrain.com/u/{file_id}",
-                            "size": result.get("size", 0)
-                        }
-                    else:
-                        error = await response.text()
-                        return {"success": False, "error": f"HTTP {response.status}: {error}"}
+        session = await get_session("transfer")
+        # Single stream on purpose: /api/file has no ranged or resumable mode, and
+        # parts joined into a PixelDrain list would yield a list URL, not the ISO
+        async with session.put(
+            f"https://pixeldrain.com/api/file/{urllib.parse.quote(filename, safe='')}",
+            data=_SizedStreamPayload(chunks, size, content_type="application/octet-stream"),
+            headers=_PIXELDRAIN_AUTH_HEADER,
+            timeout=LONG_TIMEOUT
+        ) as response:
+            if response.status in [200, 201]:  # Accept both 200 and 201
+                # PixelDrain returns text/plain, parse as JSON manually; json
+                # takes the raw bytes, skipping aiohttp's charset detection
+                result = json.loads(await response.read())
+                file_id = result.get("id")
+                return {
+                    "success": True,
+                    "file_id": file_id,
+                    "download_url": f"https://pixeldrain.com/api/file/{file_id}",
+                    "view_url": f"https://pixeldrain.com/u/{file_id}",
+                    "size": result.get("size", size)
+                }
+            else:
+                error = await response.text()
+                return {"success": False, "error": f"HTTP {response.status}: {error}"}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -241,43 +826,90 @@ async def auto_match_iso_with_server(
 
     Server will search through all providers and find the matching ISO.
     """
+    global _LIST_CACHE
     if not API_KEY:
         logger.warning("No API_KEY - skipping server auto-match")
         return {"success": False, "error": "No API key"}
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{API_URL}/admin/hosted-iso/auto-match",
-                headers={
-                    "Authorization": f"Bearer {API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "file_name": file_name,
-                    "file_size": file_size,
-                    "platform": platform,
-                    "file_id": file_id,
-                    "download_url": download_url,
-                },
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    return {
-                        "success": result.get("matched", False),
-                        "iso_id": result.get("iso_id"),
-                        "message": result.get("message", ""),
-                        "iso_info": result.get("iso_info")
-                    }
-                else:
-                    error_text = await response.text()
-                    return {"success": False, "error": f"HTTP {response.status}: {error_text}"}
+        session = await get_session("api")
+        async with session.post(
+            f"{API_URL}/admin/hosted-iso/auto-match",
+            headers=_API_BEARER,
+            data=json.dumps({
+                "file_name": file_name,
+                "file_size": file_size,
+                "platform": platform,
+                "file_id": file_id,
+                "download_url": download_url,
+            }, separators=(",", ":")).encode(),
+            timeout=SHORT_TIMEOUT
+        ) as response:
+            if response.status == 200:
+                result = json.loads(await response.read())
+                # The server may now host a new file; make /list refetch
+                _LIST_CACHE = None
+                return {
+                    "success": result.get("matched", False),
+                    "iso_id": result.get("iso_id"),
+                    "message": result.get("message", ""),
+                    "iso_info": result.get("iso_info")
+                }
+            else:
+                error_text = await response.text()
+                return {"success": False, "error": f"HTTP {response.status}: {error_text}"}
     except Exception as e:
-        logger.error(f"Failed to auto-match with server: {e}")
+        logger.error("Failed to auto-match with server: %s", e)
         return {"success": False, "error": str(e)}
 
 
+async def document_to_pixeldrain(
+    document: Document,
+    filename: str,
+    msg: ThrottledMessage
+) -> Dict[str, Any]:
+    """
+    Move a Telegram document to PixelDrain, touching disk as little as possible.
+
+    A local Bot API server reports the path of its own copy, which is
+    uploaded as is. A file URL is piped straight into the upload. Only when
+    neither works (no usable Content-Length, or the URL can't be opened) is
+    the file downloaded to a temp file first.
+    """
+    file = await document.get_file()
+    file_path = file.file_path or ""
+
+    if os.path.isfile(file_path):
+        await msg.edit_text(f"☁️ Uploading to PixelDrain...\n\n"
+                           f"This may take a while for large files.")
+        return await upload_to_pixeldrain(file_path, filename)
+
+    if file_path.startswith(("http://", "https://")):
+        try:
+            session = await get_session("transfer")
+            async with session.get(file_path, timeout=LONG_TIMEOUT) as response:
+                size = response.content_length
+                content_encoding = response.headers.get("Content-Encoding", "identity")
+                if response.status == 200 and size and content_encoding == "identity":
+                    await msg.edit_text(f"☁️ Streaming from Telegram to PixelDrain...\n\n"
+                                       f"This may take a while for large files.")
+                    return await pipe_to_pixeldrain(response, filename, size)
+                logger.warning("Telegram file URL not streamable (HTTP %s), downloading first", response.status)
+        except aiohttp.ClientError as e:
+            # The URL embeds the bot token, so only the error type is logged
+            logger.warning("Telegram file URL unreachable (%s), downloading first", type(e).__name__)
+
+    await msg.edit_text(f"⬇️ Downloading from Telegram...")
+    temp_path = await download_document(document)
+    try:
+        await msg.edit_text(f"☁️ Uploading to PixelDrain...\n\n"
+                           f"This may take a while for large files.")
+        return await upload_to_pixeldrain(temp_path, filename)
+    finally:
+        # Clean up temp file, even if the upload blew up
+        await asyncio.to_thread(os.unlink, temp_path)
+
+
 async def upload_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
     Handle ISO upload - reply to a document.
@@ -307,45 +939,34 @@ async def upload_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     file_size = document.file_size
     filename = document.file_name
 
-    msg = await update.message.reply_text(
-        f"📦 Processing: {filename}\n"
-        f"📏 Size: {format_size(file_size)}\n\n"
-        f"⏳ Starting upload..."
-    )
-
     # Choose platform based on size
     # Telegram Premium: 8GB limit
     # PixelDrain: No limit
     use_pixeldrain = file_size > 7 * 1024**3  # > 7GB
 
     if use_pixeldrain and not PIXELDRAIN_API_KEY:
-        await msg.edit_text(
+        await update.message.reply_text(
             f"⚠️ File is {file_size / (1024**3):.1f}GB (>7GB)\n"
             f"Requires PixelDrain, but no API key configured.\n\n"
             f"Set PIXELDRAIN_API_KEY environment variable."
         )
         return
 
-    try:
-        # Download file from Telegram
-        await msg.edit_text(f"⬇️ Downloading from Telegram...")
-
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".iso")
-        temp_path = temp_file.name
-        temp_file.close()
-
-        file = await document.get_file()
-        await file.download_to_drive(temp_path)
+    msg = ThrottledMessage(await update.message.reply_text(
+        f"📦 Processing: {filename}\n"
+        f"📏 Size: {format_size(file_size)}\n\n"
+        f"⏳ Starting upload..."
+    ))
 
+    try:
         # Upload to chosen platform
         if use_pixeldrain:
-            await msg.edit_text(f"☁️ Uploading to PixelDrain...\n\n"
-                               f"This may take a while for large files.")
-            result = await upload_to_pixeldrain(temp_path, filename)
+            result = await document_to_pixeldrain(document, filename, msg)
             platform = "pixeldrain"
         else:
             await msg.edit_text(f"☁️ Using Telegram hosting...")
-            # For Telegram, the file_id is already available
+            # For Telegram, the file_id is already available, so the file
+            # itself never needs to be downloaded
             result = {
                 "success": True,
                 "file_id": document.file_id,
@@ -354,9 +975,6 @@ async def upload_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             }
             platform = "telegram"
 
-        # Clean up temp file
-        os.unlink(temp_path)
-
         if not result.get("success"):
             await msg.edit_text(f"❌ Upload failed:\n{result.get('error', 'Unknown error')}")
             return
@@ -372,20 +990,21 @@ async def upload_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             download_url=result.get("download_url", "")
         )
 
+        folder_line = _tag_upload_folder(context)
+        status = UploadStatus(filename, file_size, name_label="📁 File: ", size_label="📏 Size: ")
+
         if match_result.get("success") and match_result.get("iso_id"):
             iso_id = match_result["iso_id"]
             iso_info = match_result.get("iso_info", {})
 
-            await msg.edit_text(
-                f"✅ Upload successful!\n\n"
-                f"📁 File: {filename}\n"
-                f"📏 Size: {format_size(file_size)}\n"
-                f"🌐 Platform: {platform.upper()}\n\n"
+            await msg.edit_text(status.render(
+                "✅ Upload successful!",
+                f"🌐 Platform: {platform.upper()}\n{folder_line}\n"
                 f"🎯 Matched: {iso_info.get('name', 'Unknown')} {iso_info.get('version', '')}\n"
                 f"💿 Architecture: {iso_info.get('architecture', 'N/A')}\n\n"
                 f"🆔 ISO ID: {iso_id}\n"
                 f"🔗 Ready for download!"
-            )
+            ))
         else:
             # Uploaded but not matched - show direct link
             download_url = result.get("download_url", "")
@@ -396,28 +1015,26 @@ async def upload_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 if view_url:
                     link_msg += f"🔗 View: {view_url}"
 
-                await msg.edit_text(
-                    f"✅ Upload successful!\n\n"
-                    f"📁 File: {filename}\n"
-                    f"📏 Size: {format_size(file_size)}\n"
-                    f"🌐 Platform: {platform.upper()}\n\n"
+                await msg.edit_text(status.render(
+                    "✅ Upload successful!",
+                    f"🌐 Platform: {platform.upper()}\n{folder_line}\n"
                     f"{link_msg}\n\n"
                     f"⚠️ Could not auto-match this file to any ISO.\n"
                     f"You can manually link it in the admin panel."
-                )
+                ))
             else:
-                await msg.edit_text(
-                    f"✅ Upload successful!\n\n"
-                    f"📁 File: {filename}\n"
-                    f"📏 Size: {format_size(file_size)}\n"
-                    f"🌐 Platform: {platform.upper()}\n\n"
+                await msg.edit_text(status.render(
+                    "✅ Upload successful!",
+                    f"🌐 Platform: {platform.upper()}\n{folder_line}\n"
                     f"⚠️ Could not auto-match this file to any ISO.\n"
                     f"You can manually link it in the admin panel."
-                )
+                ))
 
     except Exception as e:
         await msg.edit_text(f"❌ Error: {str(e)}")
-        logger.error(f"Upload error: {e}", exc_info=True)
+        logger.error("Upload error: %s", e, exc_info=True)
+    finally:
+        await msg.flush()
 
 
 async def fetch_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -452,10 +1069,10 @@ async def fetch_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         await update.message.reply_text("❌ Invalid URL. Must start with http:// or https://")
         return
 
-    msg = await update.message.reply_text(
+    msg = ThrottledMessage(await update.message.reply_text(
         f"📥 Initializing...\n\n"
         f"🌐 {url[:50]}{'...' if len(url) > 50 else ''}"
-    )
+    ))
 
     try:
         if not PIXELDRAIN_API_KEY:
@@ -466,85 +1083,70 @@ async def fetch_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             )
             return
 
-        # Step 1: Get file info from URL
+        # Step 1: Open the download; its headers carry the file info, so
+        # there's no separate HEAD round trip (which some CDNs answer from a
+        # different origin anyway).
         await msg.edit_text(
             f"📡 Checking file info...\n\n"
             f"🌐 {url[:50]}{'...' if len(url) > 50 else ''}"
         )
 
-        async with aiohttp.ClientSession() as session:
-            async with session.head(
+        filename = url.split('/')[-1].split('?')[0] or "unknown.iso"
+
+        # Step 2: Pipe the download straight into the PixelDrain upload.
+        # Without a trustworthy Content-Length the upload size isn't known up
+        # front, so land the file on disk first and upload it from there.
+        start_time = time.monotonic()
+        temp_path = None
+
+        try:
+            session = await get_session("transfer")
+            async with session.get(
                 url,
-                timeout=aiohttp.ClientTimeout(total=30),
-                allow_redirects=True
-            ) as response:
-                if response.status != 200:
-                    await msg.edit_text(f"❌ URL returned HTTP {response.status}")
+                timeout=LONG_TIMEOUT
+            ) as download_response:
+                if download_response.status != 200:
+                    await msg.edit_text(f"❌ URL returned HTTP {download_response.status}")
                     return
 
-                content_length = response.headers.get('Content-Length')
+                content_length = download_response.headers.get('Content-Length')
                 file_size = int(content_length) if content_length else None
-                filename = url.split('/')[-1].split('?')[0] or "unknown.iso"
-
-                # Format initial progress message
-                size_text = f"{format_size(file_size)}" if file_size else "Unknown size"
-                await msg.edit_text(
-                    f"📁 Ready to upload!\n\n"
-                    f"📄 Name: {filename}\n"
-                    f"📏 Size: {size_text}\n"
-                    f"🌐 Target: PixelDrain\n\n"
-                    f"⏳ Starting upload..."
-                )
-
-        # Step 2: Download to temp file, then upload to PixelDrain
-        # This approach is more reliable for large files on Render's limited memory
-        start_time = datetime.now()
-
-        # Download to temp file with progress
-        await msg.edit_text(
-            f"⬇️ Downloading from URL...\n\n"
-            f"📄 {filename}\n"
-            f"📏 {size_text}\n\n"
-            f"⏳ Please wait..."
-        )
+                status = UploadStatus(filename, file_size)
 
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".iso")
-        temp_path = temp_file.name
-        temp_file.close()
-
-        try:
-            # Download the file
-            downloaded_size = 0
-            chunk_size = 1024 * 1024  # 1MB chunks
-
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    url,
-                    timeout=aiohttp.ClientTimeout(total=3600)
-                ) as download_response:
-                    if download_response.status != 200:
-                        await msg.edit_text(f"❌ Download failed: HTTP {download_response.status}")
-                        return
-
-                    with open(temp_path, 'wb') as f:
-                        async for chunk in download_response.content.iter_chunked(chunk_size):
-                            f.write(chunk)
+                content_encoding = download_response.headers.get('Content-Encoding', 'identity')
+                if file_size and content_encoding == 'identity':
+                    await msg.edit_text(status.render("☁️ Streaming to PixelDrain...", "\n⏳ Please wait..."))
+                    result = await pipe_to_pixeldrain(download_response, filename, file_size)
+                    actual_size = file_size
+                else:
+                    await msg.edit_text(status.render("⬇️ Downloading from URL...", "\n⏳ Please wait..."))
+
+                    fd, temp_path = await asyncio.to_thread(tempfile.mkstemp, suffix=".iso")
+                    downloaded_size = 0
+                    try:
+                        # Unbuffered writes: chunks go straight to the fd with
+                        # no extra copy through a Python file buffer. An 8 MB
+                        # write can block, so it runs off the event loop.
+                        async for chunk in download_response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                            view = memoryview(chunk)
+                            while view:
+                                view = view[await asyncio.to_thread(os.write, fd, view):]
                             downloaded_size += len(chunk)
-
-            actual_size = downloaded_size
-
-            # Upload to PixelDrain
-            await msg.edit_text(
-                f"☁️ Uploading to PixelDrain...\n\n"
-                f"📄 {filename}\n"
-                f"📏 {format_size(actual_size)}\n\n"
-                f"⏳ Please wait..."
-            )
-
-            result = await upload_to_pixeldrain(temp_path, filename)
-
-            # Clean up temp file
-            os.unlink(temp_path)
+                    finally:
+                        os.close(fd)
+                    actual_size = downloaded_size
+                    status.set_size(actual_size)
+
+            if temp_path:
+                # Upload to PixelDrain
+                await msg.edit_text(status.render("☁️ Uploading to PixelDrain...", "\n⏳ Please wait..."))
+
+                try:
+                    result = await upload_to_pixeldrain(temp_path, filename)
+                finally:
+                    # Clean up temp file
+                    await asyncio.to_thread(os.unlink, temp_path)
+                    temp_path = None
 
             if not result.get("success"):
                 await msg.edit_text(f"❌ Upload failed:\n{result.get('error', 'Unknown error')}")
@@ -554,9 +1156,11 @@ async def fetch_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             download_url = result["download_url"]
             view_url = result["view_url"]
             final_size = result.get("size", actual_size)
+            if final_size != actual_size:
+                status.set_size(final_size)
 
             # Calculate elapsed time
-            elapsed = (datetime.now() - start_time).total_seconds()
+            elapsed = time.monotonic() - start_time
 
             # Auto-match with server
             await msg.edit_text(f"🔍 Matching ISO with server...")
@@ -576,52 +1180,57 @@ async def fetch_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             else:
                 speed_text = "N/A"
 
+            folder_line = _tag_upload_folder(context)
+
             if match_result.get("success") and match_result.get("iso_id"):
                 iso_id = match_result["iso_id"]
                 iso_info = match_result.get("iso_info", {})
 
-                await msg.edit_text(
-                    f"✅ Upload complete!\n\n"
-                    f"📄 {filename}\n"
-                    f"📏 {format_size(final_size)}\n"
+                await msg.edit_text(status.render(
+                    "✅ Upload complete!",
                     f"⚡ Speed: {speed_text}\n"
                     f"⏱️ Time: {elapsed:.1f}s\n\n"
                     f"🎯 Matched: {iso_info.get('name', 'Unknown')} {iso_info.get('version', '')}\n"
                     f"💿 Architecture: {iso_info.get('architecture', 'N/A')}\n\n"
                     f"🌐 Platform: PIXELDRAIN\n"
+                    f"{folder_line}"
                     f"🆔 ISO ID: {iso_id}\n"
                     f"🔗 View: {view_url}\n"
                     f"⬇️ Direct: {download_url}\n\n"
                     f"Ready for download!"
-                )
+                ))
             else:
-                await msg.edit_text(
-                    f"✅ Upload complete!\n\n"
-                    f"📄 {filename}\n"
-                    f"📏 {format_size(final_size)}\n"
+                await msg.edit_text(status.render(
+                    "✅ Upload complete!",
                     f"⚡ Speed: {speed_text}\n"
                     f"⏱️ Time: {elapsed:.1f}s\n\n"
                     f"🌐 Platform: PIXELDRAIN\n"
+                    f"{folder_line}"
                     f"🆔 ID: {file_id}\n"
                     f"🔗 View: {view_url}\n"
                     f"⬇️ Direct: {download_url}\n\n"
                     f"⚠️ Could not auto-match this file to any ISO."
-                )
+                ))
 
-            logger.info(f"Fetched from URL and uploaded to PixelDrain: {filename} - {speed_text}, {elapsed:.1f}s")
+            logger.info(
+                "Fetched from URL and uploaded to PixelDrain: %s - %s, %.1fs",
+                filename, speed_text, elapsed
+            )
 
-        except Exception as inner_e:
-            # Clean up temp file if it exists
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-            raise inner_e
+        finally:
+            # Clean up the temp file if the upload step didn't, including
+            # when the fetch fails or is cancelled midway
+            if temp_path:
+                await asyncio.to_thread(os.unlink, temp_path)
 
     except asyncio.TimeoutError:
         await msg.edit_text("❌ Timeout: Operation took too long")
-        logger.error(f"Fetch timeout for URL: {url}")
+        logger.error("Fetch timeout for URL: %s", url)
     except Exception as e:
         await msg.edit_text(f"❌ Error: {str(e)[:200]}")
-        logger.error(f"Fetch error: {e}", exc_info=True)
+        logger.error("Fetch error: %s", e, exc_info=True)
+    finally:
+        await msg.flush()
 
 
 async def info_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -646,11 +1255,39 @@ async def info_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 🆔 File ID: {file_id_short}
 📊 MIME Type: {doc.mime_type}
 
-📅 Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+📅 Date: {_now_full()}
     """
     await update.message.reply_text(info)  # Removed parse_mode to avoid Markdown errors
 
 
+async def _get_isos() -> Dict[str, Any]:
+    """
+    Fetch the hosted-ISO list from the server.
+
+    Successful results are reused for LIST_CACHE_TTL seconds, so several
+    /list calls in a row cost one backend round trip. auto-matching a new
+    upload clears the cache.
+    """
+    global _LIST_CACHE
+    now = time.monotonic()
+    if _LIST_CACHE is not None and now - _LIST_CACHE[0] < LIST_CACHE_TTL:
+        return {"success": True, "isos": _LIST_CACHE[1]}
+
+    session = await get_session("api")
+    async with session.get(
+        f"{API_URL}/admin/hosted-iso",
+        headers=_API_AUTH_HEADER,
+        timeout=SHORT_TIMEOUT
+    ) as response:
+        if response.status != 200:
+            return {"success": False, "error": f"HTTP {response.status}"}
+        data = json.loads(await response.read())
+
+    isos = data.get("isos", [])
+    _LIST_CACHE = (now, isos)
+    return {"success": True, "isos": isos}
+
+
 async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """List hosted ISOs."""
     if not is_authorized(update, context):
@@ -661,52 +1298,54 @@ async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         return
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{API_URL}/admin/hosted-iso",
-                headers={"Authorization": f"Bearer {API_KEY}"},
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    isos = data.get("isos", [])
-
-                    if not isos:
-                        await update.message.reply_text("📭 No hosted ISOs found.")
-                        return
-
-                    msg = "📦 Hosted ISOs:\n\n"
-                    for iso in isos[:10]:  # Limit to 10
-                        msg += f"• {iso.get('name', 'Unknown')} ({iso.get('platform', 'unknown')})\n"
-                        msg += f"  {format_size(iso.get('file_size', 0))}\n"
-
-                    if len(isos) > 10:
-                        msg += f"\n... and {len(isos) - 10} more"
-
-                    await update.message.reply_text(msg)  # Removed parse_mode to avoid Markdown errors
-                else:
-                    await update.message.reply_text(f"❌ Server error: HTTP {response.status}")
+        result = await _get_isos()
+        if not result["success"]:
+            await update.message.reply_text(f"❌ Server error: {result['error']}")
+            return
+
+        isos = result["isos"]
+        if not isos:
+            await update.message.reply_text("📭 No hosted ISOs found.")
+            return
+
+        # One line pair per ISO, rendered in a single pass and joined once
+        parts = ["📦 Hosted ISOs:\n"]
+        parts.extend(
+            f"• {iso.get('name', 'Unknown')} ({iso.get('platform', 'unknown')})\n"
+            f"  {format_size(iso.get('file_size', 0))}"
+            for iso in isos[:10]  # Limit to 10
+        )
+
+        if len(isos) > 10:
+            parts.append(f"\n... and {len(isos) - 10} more")
+
+        await update.message.reply_text("\n".join(parts))  # Removed parse_mode to avoid Markdown errors
     except Exception as e:
         await update.message.reply_text(f"❌ Error: {str(e)}")
 
 
 async def auto_ping_job(context: ContextTypes.DEFAULT_TYPE) -> None:
     """Background auto-ping job."""
-    logger.info(f"Running auto-ping for {len(PING_TARGETS)} targets...")
+    logger.info("Running auto-ping for %s targets...", len(PING_TARGETS))
     
-    stats = context.bot_data.get('stats', {'total': 0, 'success': 0, 'failed': 0})
+    stats = context.bot_data["stats"]
     
     for url in PING_TARGETS:
-        success, message, status_code = await ping_site(url)
-        stats['total'] += 1
-        if success:
-            stats['success'] += 1
-            logger.info(f"✅ Auto-ping successful for {url}: HTTP {status_code}")
+        # A successful user ping this recent already kept the site awake
+        last = context.bot_data["last_ping"].get(url)
+        if last is not None and last[1].ok and time.monotonic() - last[0] < PING_FRESH_FOR:
+            logger.info("Skipping auto-ping for %s: reached %.0fs ago", url, time.monotonic() - last[0])
+            continue
+
+        result = await ping_site(url, method="HEAD")
+        context.bot_data["last_ping"][url] = (time.monotonic(), result)
+        stats.total += 1
+        if result.ok:
+            stats.success += 1
+            logger.info("✅ Auto-ping successful for %s: HTTP %s", url, result.status)
         else:
-            stats['failed'] += 1
-            logger.warning(f"❌ Auto-ping failed for {url}: {message}")
-
-    context.bot_data['stats'] = stats
+            stats.failed += 1
+            logger.warning("❌ Auto-ping failed for %s: %s", url, result.message)
 
 
 # ============================================================================
@@ -740,31 +1379,30 @@ async def folder_create_command(update: Update, context: ContextTypes.DEFAULT_TY
 
     try:
         # PixelDrain doesn't have a folder API, so we simulate folders
-        # by storing them in bot_data and prefixing file names
+        # by storing them in user_data and tagging uploads with the name
         user_id = update.effective_user.id
 
-        if user_id not in CURRENT_FOLDER:
-            CURRENT_FOLDER[user_id] = {}
-
-        CURRENT_FOLDER[user_id][folder_name] = {
+        folders = context.user_data.setdefault("folders", OrderedDict())
+        folders[folder_name] = {
             "created_at": datetime.now().isoformat(),
             "file_count": 0
         }
+        context.user_data["current_folder"] = folder_name
 
         await msg.edit_text(
             f"✅ Folder created!\n\n"
             f"📁 Name: {folder_name}\n"
             f"👤 Created by: {update.effective_user.first_name}\n"
-            f"📅 Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+            f"📅 Time: {_now_full()}\n\n"
             f"💡 Uploads to this folder will be tagged with the folder name.\n"
             f"Use /folder_set to switch between folders."
         )
 
-        logger.info(f"Created PixelDrain folder: {folder_name} by user {user_id}")
+        logger.info("Created PixelDrain folder: %s by user %s", folder_name, user_id)
 
     except Exception as e:
         await msg.edit_text(f"❌ Error: {str(e)}")
-        logger.error(f"Folder creation error: {e}", exc_info=True)
+        logger.error("Folder creation error: %s", e, exc_info=True)
 
 
 async def folder_list_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -772,9 +1410,9 @@ async def folder_list_command(update: Update, context: ContextTypes.DEFAULT_TYPE
     if not is_authorized(update, context):
         return  # Silently ignore
 
-    user_id = update.effective_user.id
+    folders = context.user_data.get("folders")
 
-    if user_id not in CURRENT_FOLDER or not CURRENT_FOLDER[user_id]:
+    if not folders:
         await update.message.reply_text(
             "📁 Your folders:\n\n"
             "No folders found.\n\n"
@@ -782,15 +1420,15 @@ async def folder_list_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         return
 
-    folders = CURRENT_FOLDER[user_id]
-
-    msg = "📁 Your PixelDrain folders:\n\n"
+    parts = ["📁 Your PixelDrain folders:\n\n"]
     for folder_name, info in folders.items():
-        msg += f"📂 {folder_name}\n"
-        msg += f"   Files: {info['file_count']}\n"
-        msg += f"   Created: {info['created_at']}\n\n"
+        parts.append(
+            f"📂 {folder_name}\n"
+            f"   Files: {info['file_count']}\n"
+            f"   Created: {info['created_at']}\n\n"
+        )
 
-    await update.message.reply_text(msg)
+    await update.message.reply_text("".join(parts))
 
 
 async def folder_set_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -800,17 +1438,13 @@ async def folder_set_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     if not context.args:
         # Show current folder
-        user_id = update.effective_user.id
-        if user_id in CURRENT_FOLDER and CURRENT_FOLDER[user_id]:
-            # Find current folder (one with most recent timestamp would be active)
-            current = next(reversed(list(CURRENT_FOLDER[user_id].items())), None)
-            if current:
-                folder_name = current[0]
-                await update.message.reply_text(
-                    f"📁 Current folder: {folder_name}\n\n"
-                    f"Use /folder_set <name> to switch folders."
-                )
-                return
+        folder_name = context.user_data.get("current_folder")
+        if folder_name:
+            await update.message.reply_text(
+                f"📁 Current folder: {folder_name}\n\n"
+                f"Use /folder_set <name> to switch folders."
+            )
+            return
 
         await update.message.reply_text(
             "📁 No folder is currently set.\n\n"
@@ -820,21 +1454,19 @@ async def folder_set_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     folder_name = " ".join(context.args)
-    user_id = update.effective_user.id
+    folders = context.user_data.get("folders", {})
 
-    if user_id not in CURRENT_FOLDER or folder_name not in CURRENT_FOLDER[user_id]:
+    if folder_name not in folders:
         await update.message.reply_text(
             f"❌ Folder '{folder_name}' not found.\n\n"
             f"List folders with: /folder_list"
         )
         return
 
-    # Set as current
-    # In our implementation, the "current folder" is just the last accessed one
-    # Move it to the end of the dict to make it "current"
-    folder_data = CURRENT_FOLDER[user_id][folder_name]
-    del CURRENT_FOLDER[user_id][folder_name]
-    CURRENT_FOLDER[user_id][folder_name] = folder_data
+    # Set as current and move it to the end so /folder_list shows
+    # the most recently used folder last
+    folders.move_to_end(folder_name)
+    context.user_data["current_folder"] = folder_name
 
     await update.message.reply_text(
         f"✅ Current folder set to: {folder_name}\n\n"
@@ -875,10 +1507,6 @@ async def allow_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         await update.message.reply_text("❌ Invalid user ID. Must be a number.")
         return
 
-    # Initialize allowed_users set if not exists
-    if 'allowed_users' not in context.bot_data:
-        context.bot_data['allowed_users'] = set()
-
     allowed_users = context.bot_data['allowed_users']
 
     # Check if already allowed
@@ -886,16 +1514,18 @@ async def allow_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         await update.message.reply_text(f"✅ User {target_user_id} is already authorized.")
         return
 
-    # Add to allowed list
-    allowed_users.add(target_user_id)
+    # Add to allowed list (frozenset is replaced, never mutated in place)
+    allowed_users = allowed_users | {target_user_id}
     context.bot_data['allowed_users'] = allowed_users
+    bisect.insort(context.bot_data.setdefault('allowed_users_sorted', []), target_user_id)
+    _is_auth.cache_clear()
 
     await update.message.reply_text(
         f"✅ User {target_user_id} has been granted access.\n\n"
         f"Total authorized users: {len(allowed_users) + 1}"  # +1 for owner
     )
 
-    logger.info(f"Owner {user_id} granted access to user {target_user_id}")
+    logger.info("Owner %s granted access to user %s", user_id, target_user_id)
 
 
 async def deny_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -931,7 +1561,7 @@ async def deny_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         await update.message.reply_text("❌ Cannot revoke owner's access.")
         return
 
-    allowed_users = context.bot_data.get('allowed_users', set())
+    allowed_users = context.bot_data['allowed_users']
 
     # Check if user is allowed
     if target_user_id not in allowed_users:
@@ -939,15 +1569,20 @@ async def deny_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         return
 
     # Remove from allowed list
-    allowed_users.remove(target_user_id)
+    allowed_users = allowed_users - {target_user_id}
     context.bot_data['allowed_users'] = allowed_users
+    sorted_users = context.bot_data.setdefault('allowed_users_sorted', [])
+    idx = bisect.bisect_left(sorted_users, target_user_id)
+    if idx < len(sorted_users) and sorted_users[idx] == target_user_id:
+        sorted_users.pop(idx)
+    _is_auth.cache_clear()
 
     await update.message.reply_text(
         f"✅ Access revoked from user {target_user_id}.\n\n"
         f"Total authorized users: {len(allowed_users) + 1}"  # +1 for owner
     )
 
-    logger.info(f"Owner {user_id} revoked access from user {target_user_id}")
+    logger.info("Owner %s revoked access from user %s", user_id, target_user_id)
 
 
 async def users_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -959,20 +1594,24 @@ async def users_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         await update.message.reply_text("❌ Owner only command")
         return
 
-    allowed_users = context.bot_data.get('allowed_users', set())
+    sorted_users = context.bot_data.get('allowed_users_sorted', [])
 
-    msg = f"👥 Authorized Users\n\n"
-    msg += f"👑 Owner: {OWNER_ID}\n\n"
+    header = f"👥 Authorized Users\n\n👑 Owner: {OWNER_ID}\n\n"
 
-    if allowed_users:
-        msg += f"✅ Allowed users ({len(allowed_users)}):\n"
-        for uid in sorted(allowed_users):
-            msg += f"   • {uid}\n"
-    else:
-        msg += "✅ No additional users allowed.\n"
-        msg += "Use /allow <user_id> to grant access."
+    if not sorted_users:
+        await update.message.reply_text(
+            f"{header}"
+            "✅ No additional users allowed.\n"
+            "Use /allow <user_id> to grant access."
+        )
+        return
 
-    await update.message.reply_text(msg)
+    parts = [header, f"✅ Allowed users ({len(sorted_users)}):\n"]
+    # Long lists go out in pages to stay under Telegram's message limit
+    for start in range(0, len(sorted_users), USERS_PER_MESSAGE):
+        parts.extend(f"   • {uid}\n" for uid in sorted_users[start:start + USERS_PER_MESSAGE])
+        await update.message.reply_text("".join(parts))
+        parts = []
 
 
 # ============================================================================
@@ -981,44 +1620,61 @@ async def users_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
 def main():
     """Start the bot."""
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
-    application.bot_data['stats'] = {'total': 0, 'success': 0, 'failed': 0}
-    application.bot_data['allowed_users'] = set()  # Initialize allowed users set
-
-    # Keep-alive commands
-    application.add_handler(CommandHandler("start", start_command))
-    application.add_handler(CommandHandler("help", start_command))
-    application.add_handler(CommandHandler("check", check_command))
-    application.add_handler(CommandHandler("wake", check_command))
-    application.add_handler(CommandHandler("status", check_command))
-    application.add_handler(CommandHandler("stats", check_command))
-
-    # ISO hosting commands
-    application.add_handler(CommandHandler("upload", upload_command))
-    application.add_handler(CommandHandler("fetch", fetch_command))
-    application.add_handler(CommandHandler("folder_create", folder_create_command))
-    application.add_handler(CommandHandler("folder_list", folder_list_command))
-    application.add_handler(CommandHandler("folder_set", folder_set_command))
-    application.add_handler(CommandHandler("info", info_command))
-    application.add_handler(CommandHandler("list", list_command))
-
-    # Permission management commands (Owner only)
-    application.add_handler(CommandHandler("allow", allow_command))
-    application.add_handler(CommandHandler("deny", deny_command))
-    application.add_handler(CommandHandler("users", users_command))
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        # Talk to the Bot API over aiohttp, like the rest of the bot
+        .request(AiohttpRequest())
+        .get_updates_request(AiohttpRequest(connection_pool_size=1))
+        .post_init(init_bot_data)
+        .post_shutdown(close_session)
+        .build()
+    )
+    application.bot_data['stats'] = PingStats()
+    application.bot_data['last_ping'] = {}  # {url: (monotonic_ts, ping result)}
+
+    # Aliases of one callback share a single handler
+    commands = [
+        # Keep-alive commands
+        (["start", "help"], start_command),
+        (["check", "status", "stats"], check_command),
+        (["wake"], wake_command),
+        # ISO hosting commands
+        (["upload"], upload_command),
+        (["fetch"], fetch_command),
+        (["folder_create"], folder_create_command),
+        (["folder_list"], folder_list_command),
+        (["folder_set"], folder_set_command),
+        (["info"], info_command),
+        (["list"], list_command),
+        # Permission management commands (Owner only)
+        (["allow"], allow_command),
+        (["deny"], deny_command),
+        (["users"], users_command),
+    ]
+    application.add_handlers([CommandHandler(names, callback) for names, callback in commands])
 
     # Auto-ping job
     application.job_queue.run_repeating(
         auto_ping_job,
         interval=PING_INTERVAL,
         first=10,
+        # Collapse missed runs (e.g. after a stalled event loop) into a single
+        # ping and never run two auto-pings at once
+        job_kwargs={"coalesce": True, "max_instances": 1, "misfire_grace_time": 60},
     )
 
     logger.info("Bot started with ISO hosting support!")
-    logger.info(f"Target: {TARGET_URL}")
-    logger.info(f"Owner ID: {OWNER_ID}")
-    logger.info(f"Admin IDs: {ADMIN_IDS if ADMIN_IDS else 'None (using access control)'}")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    logger.info("Target: %s", TARGET_URL)
+    logger.info("Owner ID: %s", OWNER_ID)
+    logger.info("Admin IDs: %s", ADMIN_IDS if ADMIN_IDS else 'None (using access control)')
+    # Only command messages are handled; skip commands queued while offline
+    # A 30s long poll keeps getUpdates idle on the server side between messages
+    application.run_polling(
+        allowed_updates=[Update.MESSAGE],
+        drop_pending_updates=True,
+        timeout=30,
+    )
 
 
 if __name__ == "__main__":